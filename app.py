@@ -1,13 +1,24 @@
 import streamlit as st
+import asyncio
+import functools
+import hashlib
 import json
 import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 import openai
-from typing import Dict, List, Any
+import orjson
+from typing import Dict, List, Any, Optional, Tuple
 import base64
 from io import BytesIO
 
+def json_dumps_indent(obj: Any) -> str:
+    """Serialize obj as 2-space indented JSON text"""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
 # Configure page
 st.set_page_config(
     page_title="Meme Generator",
@@ -15,6 +26,81 @@ st.set_page_config(
     layout="wide"
 )
 
+# Maximum number of OpenAI requests in flight when generating memes in a batch
+MAX_CONCURRENT_REQUESTS = 8
+
+MEME_BRIEFS_CSV = "clay_meme_briefs/Custom-Table-Default-view-export-1758929307125.csv"
+# CSV columns a brief is built from: topic, viral explanation, detailed reason
+BRIEF_COLUMNS = ('Topic', 'Viral Reason Explanation', 'Viral Reason Explanation Reason')
+MEMEDB_PATH = "memedb.jsonl"
+LLM_CACHE_DIR = ".llm_cache"
+
+# Model and per-template output budget for meme text; a filled schema is well under 100 tokens
+LLM_MODEL = "gpt-4o-mini"
+LLM_MAX_TOKENS = 200
+
+# Instructions shared by every meme request, kept first so OpenAI can cache the prefix
+MEME_SYSTEM_PROMPT = """You are a creative meme generator. Generate funny, relevant text for meme templates.
+
+Generate SHORT, FUNNY text for each field in a template's schema. Make it relevant to the topic and the viral context.
+Keep each text under 50 characters. Be concise and punchy.
+
+Return ONLY a JSON object. Do NOT include descriptions, explanations, or metadata. Just the raw text content."""
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "fonts", "DejaVuSans-Bold.ttf")
+
+# Outermost {...} span in a model response, for recovering JSON wrapped in fences or prose
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# Structured-output schema for template analysis, so the model always returns a well-formed template
+TEMPLATE_ANALYSIS_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "meme_template",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "explanation": {"type": "string"},
+                "fields": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "description": {"type": "string"},
+                            "x": {"type": "integer"},
+                            "y": {"type": "integer"},
+                            "width": {"type": "integer"},
+                            "height": {"type": "integer"}
+                        },
+                        "required": ["name", "description", "x", "y", "width", "height"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["name", "explanation", "fields"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Maps template names onto file-safe names: spaces and dashes become underscores, punctuation is dropped
+TEMPLATE_NAME_TRANSLATION = str.maketrans({' ': '_', '-': '_', '"': None, "'": None, '!': None, '?': None, ':': None, ';': None, ',': None, '.': None})
+
+# Longest edge, in pixels, that templates are rendered at
+MAX_TEMPLATE_EDGE = 1024
+
+# Font size in points for each text size tier used by get_text_positions
+FONT_SIZES = {"large": 36, "medium": 24, "small": 18}
+
+# Text colors that differ from the default white, keyed by template name then
+# field name; the None key applies to every field of the template
+TEMPLATE_TEXT_COLORS = {
+    "change_my_mind": {None: "black"},
+    "uno_draw_25": {"consequence": "red"},
+}
+
 # Initialize OpenAI client
 @st.cache_resource
 def get_openai_client():
@@ -24,51 +110,144 @@ def get_openai_client():
         st.stop()
     return openai.OpenAI(api_key=api_key)
 
-def load_meme_briefs() -> List[Dict[str, Any]]:
-    """Load meme briefs from the CSV file with viral explanations"""
+@functools.lru_cache(maxsize=None)
+def load_default_font():
+    """Load PIL's built-in font once per process"""
+    return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=32)
+def load_font(path: str, size: int):
+    """Load a TrueType font once per (path, size), falling back to the default font"""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return load_default_font()
+
+@st.cache_resource
+def get_template_image_cache() -> Dict[Tuple[str, float], Tuple[Image.Image, float]]:
+    """Decoded template images and their resize scale, shared across reruns and keyed by (template name, mtime)"""
+    return {}
+
+def load_template_image(template_name: str, template_path: str) -> Tuple[Image.Image, float]:
+    """Decode a template once, shrunk to at most MAX_TEMPLATE_EDGE pixels, returning (image, scale)
+
+    The scale maps the template's pixel bounding boxes onto the resized image.
+    """
+    cache = get_template_image_cache()
+    # Keying on mtime picks up a template image that was replaced on disk
+    key = (template_name, get_mtime(template_path))
+    if key not in cache:
+        img = Image.open(template_path)
+        original_width = img.width
+        # Have libjpeg decode straight to RGB, at the smallest DCT scale that still covers
+        # MAX_TEMPLATE_EDGE, instead of fully decoding and then converting; thumbnail() finishes the resize
+        img.draft('RGB', (MAX_TEMPLATE_EDGE, MAX_TEMPLATE_EDGE))
+        # Decode now (which also closes the file): the cached image is shared across
+        # sessions, and a lazy image would be decoded in place by whichever thread copied it first
+        img.load()
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if max(img.size) > MAX_TEMPLATE_EDGE:
+            img.thumbnail((MAX_TEMPLATE_EDGE, MAX_TEMPLATE_EDGE), Image.Resampling.LANCZOS)
+        cache[key] = (img, img.width / original_width)
+    return cache[key]
+
+def get_mtime(path: str) -> float:
+    """Return the modification time of a file, or 0.0 if it does not exist"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+@st.cache_data(show_spinner=False)
+def read_meme_briefs(csv_path: str, mtime: float) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]], List[str]]:
+    """Parse meme briefs from the CSV file, returning (briefs, briefs by topic, errors)
+
+    mtime is only part of the cache key so the file is re-read when it changes.
+    """
     briefs = []
-    csv_path = "clay_meme_briefs/Custom-Table-Default-view-export-1758929307125.csv"
-    
-    if not os.path.exists(csv_path):
-        st.error(f"CSV file not found: {csv_path}")
-        return briefs
     
     try:
-        df = pd.read_csv(csv_path)
-        
-        for _, row in df.iterrows():
-            brief = {
-                'search': row.get('Topic', 'Unknown'),
-                'explanation': row.get('Viral Reason Explanation', ''),
-                'detailed_reason': row.get('Viral Reason Explanation Reason', ''),
-                'source': 'clay_meme_briefs'
-            }
-            briefs.append(brief)
-            
+        # Parse only the columns we use, then build briefs column-at-a-time instead of row by row
+        df = pd.read_csv(csv_path, usecols=lambda column: column in BRIEF_COLUMNS, dtype=str)
+        df = df.reindex(columns=list(BRIEF_COLUMNS)).fillna({'Topic': 'Unknown'}).fillna('')
+        briefs = [
+            {'search': topic, 'explanation': explanation, 'detailed_reason': reason, 'source': 'clay_meme_briefs'}
+            for topic, explanation, reason in zip(*(df[column].to_numpy() for column in BRIEF_COLUMNS))
+        ]
+    except FileNotFoundError:
+        return briefs, {}, [f"CSV file not found: {csv_path}"]
     except Exception as e:
-        st.error(f"Error loading CSV file: {e}")
+        return briefs, {}, [f"Error loading CSV file: {e}"]
     
-    return briefs
+    return briefs, {brief['search']: brief for brief in briefs}, []
 
-@st.cache_data
-def load_meme_templates() -> List[Dict[str, Any]]:
-    """Load meme templates from memedb.jsonl"""
-    templates = []
-    memedb_path = "memedb.jsonl"
-    
-    if not os.path.exists(memedb_path):
-        return templates
+def load_meme_briefs() -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Load meme briefs from the CSV file with viral explanations, along with a topic -> brief index"""
+    briefs, topic_options, errors = read_meme_briefs(MEME_BRIEFS_CSV, get_mtime(MEME_BRIEFS_CSV))
+    for error in errors:
+        st.error(error)
+    return briefs, topic_options
+
+@st.cache_data(show_spinner=False)
+def read_template_index(memedb_path: str, mtime: float) -> Tuple[Dict[str, int], List[str]]:
+    """Map each template name to the byte offset of its line in memedb.jsonl, returning (index, errors)
+
+    mtime is only part of the cache key so the file is re-read when it changes.
+    """
+    index = {}
     
     try:
-        with open(memedb_path, 'r', encoding='utf-8') as f:
+        with open(memedb_path, 'rb') as f:
+            offset = 0
             for line in f:
                 if line.strip():
-                    template = json.loads(line.strip())
-                    templates.append(template)
+                    name = orjson.loads(line).get('name')
+                    if name is not None and name not in index:
+                        index[name] = offset
+                offset += len(line)
+    except FileNotFoundError:
+        return index, []
     except Exception as e:
-        st.error(f"Error loading meme templates: {e}")
+        return index, [f"Error loading meme templates: {e}"]
     
-    return templates
+    return index, []
+
+def get_template_index() -> Dict[str, int]:
+    """Get the template name -> byte offset index for memedb.jsonl"""
+    index, errors = read_template_index(MEMEDB_PATH, get_mtime(MEMEDB_PATH))
+    for error in errors:
+        st.error(error)
+    return index
+
+def load_template_names() -> List[str]:
+    """Load the names of all meme templates in memedb.jsonl"""
+    return list(get_template_index())
+
+def prefetch_app_data() -> None:
+    """Parse the brief CSV and the memedb index in parallel to warm their caches
+
+    A cold start then waits on the slower of the two rather than both. Errors are
+    left for load_meme_briefs / get_template_index to report from the script thread.
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        executor.submit(read_meme_briefs, MEME_BRIEFS_CSV, get_mtime(MEME_BRIEFS_CSV))
+        executor.submit(read_template_index, MEMEDB_PATH, get_mtime(MEMEDB_PATH))
+
+def load_template_by_name(name: str) -> Optional[Dict[str, Any]]:
+    """Load a single meme template from memedb.jsonl, parsing only its line"""
+    offset = get_template_index().get(name)
+    if offset is None:
+        return None
+    
+    with open(MEMEDB_PATH, 'rb') as f:
+        f.seek(offset)
+        return orjson.loads(f.readline())
+
+@st.cache_data(show_spinner=False)
+def template_field_lines(schema: Dict[str, Any]) -> List[str]:
+    """Format a template schema as one "• field: description" line per field"""
+    return [f"• {field}: {desc.get('description', 'No description')}" for field, desc in schema.items()]
 
 def save_new_template(template: Dict[str, Any], image: Image.Image) -> bool:
     """Save a new template to memedb.jsonl and save the image to meme_templates/"""
@@ -77,16 +256,16 @@ def save_new_template(template: Dict[str, Any], image: Image.Image) -> bool:
         
         # Get template name and clean it
         original_name = template.get('name', 'custom_template')
-        template_name = original_name.lower().replace(' ', '_').replace('-', '_').replace('"', '').replace("'", '').replace('!', '').replace('?', '').replace(':', '').replace(';', '').replace(',', '').replace('.', '')
+        template_name = original_name.lower().translate(TEMPLATE_NAME_TRANSLATION)
         st.info(f"Original template name: '{original_name}' -> Cleaned name: '{template_name}'")
         
         # Ensure unique name by checking existing templates
-        existing_templates = load_meme_templates()
-        st.info(f"Found {len(existing_templates)} existing templates")
+        existing_names = get_template_index()
+        st.info(f"Found {len(existing_names)} existing templates")
         
         counter = 1
         original_clean_name = template_name
-        while any(t.get('name') == template_name for t in existing_templates):
+        while template_name in existing_names:
             template_name = f"{original_clean_name}_{counter}"
             counter += 1
             st.info(f"Name conflict, trying: {template_name}")
@@ -108,7 +287,7 @@ def save_new_template(template: Dict[str, Any], image: Image.Image) -> bool:
             image = image.convert('RGB')
             st.info("Converted image to RGB")
         
-        image.save(image_path, "JPEG", quality=95)
+        image.save(image_path, "JPEG", quality=95, optimize=True)
         st.success(f"✅ Image saved successfully to: {image_path}")
         
         # Verify image was saved
@@ -119,20 +298,15 @@ def save_new_template(template: Dict[str, Any], image: Image.Image) -> bool:
             st.error("❌ Image file was not created!")
             return False
         
-        # Save template to memedb.jsonl
+        # Save template to memedb.jsonl; stdlib json matches the spaced format of the existing lines
         st.info("Saving template to memedb.jsonl...")
-        with open("memedb.jsonl", "a", encoding='utf-8') as f:
+        with open(MEMEDB_PATH, "a", encoding='utf-8') as f:
             f.write(json.dumps(template) + "\n")
         st.success(f"✅ Template saved to memedb.jsonl with name: {template_name}")
         
-        # Verify template was saved
-        with open("memedb.jsonl", "r", encoding='utf-8') as f:
-            lines = f.readlines()
-            st.info(f"memedb.jsonl now has {len(lines)} lines")
-        
-        # Clear the cache to force reload of templates
-        load_meme_templates.clear()
-        st.info("Cache cleared, templates will reload on next access")
+        # Clear the cache to force reload of templates; the rebuilt index also verifies the new line
+        read_template_index.clear()
+        st.info(f"memedb.jsonl now has {len(get_template_index())} templates")
         
         return True
         
@@ -142,203 +316,299 @@ def save_new_template(template: Dict[str, Any], image: Image.Image) -> bool:
         st.error(f"Full error traceback: {traceback.format_exc()}")
         return False
 
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60)
+def request_template_analysis(prompt: str, image_digest: str, _img_base64: str, _client: openai.OpenAI) -> str:
+    """Send a template analysis request to OpenAI Vision, returning the raw response text
+
+    Cached on the prompt and image digest; the underscore arguments are left out of the key.
+    """
+    response = _client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{_img_base64}",
+                            "detail": "low"
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=512,
+        response_format=TEMPLATE_ANALYSIS_FORMAT
+    )
+    
+    message = response.choices[0].message
+    if getattr(message, 'refusal', None):
+        raise ValueError(f"Model declined to analyze the image: {message.refusal}")
+    return message.content
+
 def analyze_image_for_meme_template(image: Image.Image, description: str, client: openai.OpenAI) -> Dict[str, Any]:
     """Analyze an uploaded image to create a meme template using OpenAI Vision"""
     
+    # Upload a copy capped at MAX_TEMPLATE_EDGE; with detail="low" the model only looks at a
+    # 512 px version, so more pixels are wasted upload. The original is what gets saved.
+    upload = image.convert('RGB') if image.mode != 'RGB' else image.copy()
+    upload.thumbnail((MAX_TEMPLATE_EDGE, MAX_TEMPLATE_EDGE), Image.Resampling.LANCZOS)
+    
     # Convert PIL image to base64
     buffered = BytesIO()
-    image.save(buffered, format="JPEG")
-    img_base64 = base64.b64encode(buffered.getvalue()).decode()
+    upload.save(buffered, format="JPEG")
+    img_bytes = buffered.getvalue()
+    img_base64 = base64.b64encode(img_bytes).decode()
     
     prompt = f"""
     Analyze this image as a potential meme template. The user provided this description: "{description}"
     
-    Based on the image and description, create a meme template JSON structure with:
-    1. A descriptive name for the template
+    Based on the image and description, create a meme template with:
+    1. A descriptive snake_case name for the template
     2. An explanation of what the meme represents
-    3. A schema defining text fields that can be overlaid on the image
-    4. Bounding boxes for each text field with x, y, width, height coordinates
+    3. The text fields that can be overlaid on the image, each with a snake_case name, a description
+       of what the text represents, and a bounding box (x, y, width, height) for where it goes
     
     Look for areas in the image where text is typically placed in memes (speech bubbles, signs, captions, etc.).
     Identify 1-4 text areas that would make sense for meme text.
     
-    Return ONLY a JSON object with this structure:
-    {{
-        "name": "descriptive_template_name",
-        "explanation": "What this meme template represents",
-        "schema": {{
-            "field1": {{"description": "What this text field represents"}},
-            "field2": {{"description": "What this text field represents"}}
-        }},
-        "bounding_boxes": {{
-            "field1": {{"x": 100, "y": 200, "width": 300, "height": 80}},
-            "field2": {{"x": 150, "y": 400, "width": 250, "height": 60}}
-        }}
-    }}
-    
-    Use absolute pixel coordinates based on the image dimensions. Make sure bounding boxes are positioned appropriately for text placement.
+    Use absolute pixel coordinates for the full-size image, which is {image.width}x{image.height} pixels, with x, y
+    being the top-left corner of the box. Make sure bounding boxes are positioned appropriately for text placement.
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1000,
-            response_format={"type": "json_object"}
-        )
+        # Re-analyzing the same image with the same description reuses the earlier response
+        content = request_template_analysis(prompt, hashlib.sha1(img_bytes).hexdigest(), img_base64, client)
+        result = json.loads(content)
         
-        content = response.choices[0].message.content.strip()
-        
-        try:
-            template = json.loads(content)
-            return template
-        except json.JSONDecodeError:
-            # Try to extract JSON from the response if it's wrapped in markdown or other text
-            import re
-            
-            # Look for JSON in code blocks
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', content, re.DOTALL)
-            if json_match:
-                try:
-                    template = json.loads(json_match.group(1))
-                    return template
-                except json.JSONDecodeError:
-                    pass
-            
-            # Look for JSON object in the text
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                try:
-                    template = json.loads(json_match.group(0))
-                    return template
-                except json.JSONDecodeError:
-                    pass
-            
-            # If all else fails, create a basic template structure
-            st.warning("Could not parse JSON response, creating basic template structure")
-            
-            # Extract basic info from the response
-            lines = content.split('\n')
-            name = "custom_template"
-            explanation = "Custom meme template"
-            
-            # Try to extract name and explanation from the response
-            for line in lines:
-                if 'name' in line.lower() and ':' in line:
-                    name_part = line.split(':')[-1].strip().strip('"\'')
-                    if name_part:
-                        name = name_part
-                elif 'explanation' in line.lower() and ':' in line:
-                    exp_part = line.split(':')[-1].strip().strip('"\'')
-                    if exp_part:
-                        explanation = exp_part
-            
-            # Create a basic template structure
-            template = {
-                "name": name.lower().replace(' ', '_').replace('-', '_'),
-                "explanation": explanation,
-                "schema": {
-                    "text1": {"description": "Main text for the meme"},
-                    "text2": {"description": "Secondary text for the meme"}
-                },
-                "bounding_boxes": {
-                    "text1": {"x": 50, "y": 50, "width": 300, "height": 80},
-                    "text2": {"x": 50, "y": 200, "width": 300, "height": 80}
-                }
+        # Structured outputs can't express free-form keys, so fields come back as a list;
+        # turn them into the schema / bounding_boxes mappings memedb.jsonl uses
+        fields = result['fields']
+        return {
+            "name": result['name'],
+            "explanation": result['explanation'],
+            "schema": {field['name']: {"description": field['description']} for field in fields},
+            "bounding_boxes": {
+                field['name']: {key: field[key] for key in ('x', 'y', 'width', 'height')}
+                for field in fields
             }
-            
-            return template
+        }
             
     except Exception as e:
         st.error(f"Error analyzing image: {e}")
         return None
 
-def generate_meme_content(topic: str, template: Dict[str, Any], client: openai.OpenAI, viral_context: str = "") -> Dict[str, str]:
-    """Generate meme content using OpenAI"""
-    
-    # Create prompt for OpenAI
+def build_meme_messages(topic: str, template: Dict[str, Any], viral_context: str = "") -> List[Dict[str, str]]:
+    """Build the chat messages used to generate meme content
+
+    Everything that depends only on the template goes in the system message, ahead of the
+    topic, so repeat requests for the same template share a prompt prefix.
+    """
     schema = template.get('schema', {})
     explanation = template.get('explanation', '')
     
+    system_prompt = f"""{MEME_SYSTEM_PROMPT}
+
+Template: "{template['name']}"
+
+Template explanation: {explanation}
+
+Template schema: {json_dumps_indent(schema)}
+
+Return a JSON object with field names as keys and SHORT text strings as values.
+Example format: {{"field1": "short funny text", "field2": "another short text"}}"""
+    
     prompt = f"""
-    Create a meme about "{topic}" using the "{template['name']}" template.
+    Create a meme about "{topic}" using this template.
+    
+    Viral context: {viral_context}
+    """
+    
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def build_meme_request(messages: List[Dict[str, str]], max_tokens: int = LLM_MAX_TOKENS) -> Dict[str, Any]:
+    """Build the chat completion kwargs shared by every meme content request"""
+    return {
+        "model": LLM_MODEL,
+        "messages": messages,
+        "temperature": 0.8,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"}
+    }
+
+def load_json_object(content: str) -> Any:
+    """Parse a model response as JSON, falling back to the outermost {...} span
+
+    Recovers objects wrapped in code fences or surrounding prose.
+    Raises json.JSONDecodeError if no valid JSON can be found.
+    """
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        match = JSON_OBJECT_RE.search(content)
+        if not match:
+            raise
+        return json.loads(match.group(0))
+
+def parse_meme_content(content: str) -> Dict[str, str]:
+    """Parse the model response into a field -> text mapping
+
+    Raises json.JSONDecodeError if the response is not valid JSON.
+    """
+    return clean_meme_content(load_json_object(content))
+
+def clean_meme_content(result: Dict[str, Any]) -> Dict[str, str]:
+    """Reduce a parsed model response to plain field -> text values"""
+    cleaned_result = {}
+    for field, value in result.items():
+        if isinstance(value, dict):
+            # If it's a dict with description, extract the description
+            if 'description' in value:
+                cleaned_result[field] = value['description']
+            else:
+                # Take the first string value from the dict
+                for v in value.values():
+                    if isinstance(v, str):
+                        cleaned_result[field] = v
+                        break
+        elif isinstance(value, str):
+            cleaned_result[field] = value
+        else:
+            cleaned_result[field] = str(value)
     
-    Template explanation: {explanation}
+    return cleaned_result
+
+def llm_cache_key(request: Dict[str, Any]) -> str:
+    """Hash a chat completion request into a cache key"""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_cached_meme_content(key: str) -> Optional[Dict[str, str]]:
+    """Return meme content previously generated for this request key, if any"""
+    try:
+        with open(os.path.join(LLM_CACHE_DIR, f"{key}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def store_cached_meme_content(key: str, meme_content: Dict[str, str]) -> None:
+    """Persist generated meme content so identical requests skip the API"""
+    os.makedirs(LLM_CACHE_DIR, exist_ok=True)
     
-    Template schema: {json.dumps(schema, indent=2)}
+    # Write to a temporary file first so concurrent sessions never read a partial entry
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=LLM_CACHE_DIR, suffix='.tmp', delete=False) as f:
+        json.dump(meme_content, f)
+    os.replace(f.name, os.path.join(LLM_CACHE_DIR, f"{key}.json"))
+
+def generate_meme_content(topic: str, template: Dict[str, Any], client: openai.OpenAI, viral_context: str = "", use_cache: bool = True) -> Dict[str, str]:
+    """Generate meme content using OpenAI, reusing cached results for identical prompts"""
     
-    Viral context: {viral_context}
+    schema = template.get('schema', {})
+    request = build_meme_request(build_meme_messages(topic, template, viral_context))
+    cache_key = llm_cache_key(request)
     
-    Generate SHORT, FUNNY text for each field in the schema. Make it relevant to the topic "{topic}" and the viral context.
-    Keep each text under 50 characters. Be concise and punchy.
+    if use_cache:
+        cached = load_cached_meme_content(cache_key)
+        if cached is not None:
+            return cached
     
-    Return ONLY a JSON object with field names as keys and SHORT text strings as values.
-    Example format: {{"field1": "short funny text", "field2": "another short text"}}
+    try:
+        response = client.chat.completions.create(**request)
+        
+        content = response.choices[0].message.content.strip()
+        meme_content = parse_meme_content(content)
+            
+    except Exception as e:
+        st.error(f"Error generating meme content: {e}")
+        return {key: "Error generating text" for key in schema.keys()}
     
-    Do NOT include descriptions, explanations, or metadata. Just the raw text content.
+    # A failed cache write shouldn't throw away content the API already returned
+    try:
+        store_cached_meme_content(cache_key, meme_content)
+    except OSError as e:
+        st.warning(f"Could not cache meme content: {e}")
+    return meme_content
+
+def generate_memes_bulk(topic: str, templates: List[Dict[str, Any]], client: openai.OpenAI, viral_context: str = "") -> Dict[str, Dict[str, str]]:
+    """Generate meme content for several templates in a single OpenAI request
+
+    Falls back to one request per template if the combined response cannot be parsed.
+    """
+    template_specs = "\n\n".join(
+        f"""Template "{template['name']}"
+    Explanation: {template.get('explanation', '')}
+    Schema: {json_dumps_indent(template.get('schema', {}))}"""
+        for template in templates
+    )
+    
+    prompt = f"""
+    Create a meme about "{topic}" for each of these templates:
+    
+    {template_specs}
+    
+    Viral context: {viral_context}
+    
+    Return a JSON object with template names as keys. Each value is an object with that template's field names as keys and SHORT text strings as values.
+    Example format: {{"template_name": {{"field1": "short funny text", "field2": "another short text"}}}}
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a creative meme generator. Generate funny, relevant text for meme templates."},
+        response = client.chat.completions.create(**build_meme_request(
+            [
+                {"role": "system", "content": MEME_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.8,
-            max_tokens=500,
-            response_format={"type": "json_object"}
-        )
+            max_tokens=LLM_MAX_TOKENS * len(templates)
+        ))
         
         content = response.choices[0].message.content.strip()
+        result = load_json_object(content)
+        return {template['name']: clean_meme_content(result[template['name']]) for template in templates}
+    
+    except (json.JSONDecodeError, KeyError, AttributeError, TypeError):
+        st.warning("Failed to parse combined response, generating each template separately")
+        meme_contents = asyncio.run(generate_many([(topic, template) for template in templates], viral_context))
+        return {template['name']: meme_content for template, meme_content in zip(templates, meme_contents)}
+    
+    except Exception as e:
+        st.error(f"Error generating meme content: {e}")
+        return {template['name']: {key: "Error generating text" for key in template.get('schema', {}).keys()} for template in templates}
+
+async def generate_meme_content_async(topic: str, template: Dict[str, Any], client: openai.AsyncOpenAI, sem: asyncio.Semaphore, viral_context: str = "") -> Dict[str, str]:
+    """Generate meme content using the async OpenAI client, bounded by a semaphore"""
+    
+    schema = template.get('schema', {})
+    
+    try:
+        async with sem:
+            response = await client.chat.completions.create(
+                **build_meme_request(build_meme_messages(topic, template, viral_context))
+            )
         
-        try:
-            result = json.loads(content)
-            
-            # Clean up the result to extract only text values
-            cleaned_result = {}
-            for field, value in result.items():
-                if isinstance(value, dict):
-                    # If it's a dict with description, extract the description
-                    if 'description' in value:
-                        cleaned_result[field] = value['description']
-                    else:
-                        # Take the first string value from the dict
-                        for v in value.values():
-                            if isinstance(v, str):
-                                cleaned_result[field] = v
-                                break
-                elif isinstance(value, str):
-                    cleaned_result[field] = value
-                else:
-                    cleaned_result[field] = str(value)
-            
-            return cleaned_result
-            
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract text from the response
-            st.warning("Failed to parse JSON response, using fallback text extraction")
-            return {key: f"Generated text for {topic}" for key in schema.keys()}
+        content = response.choices[0].message.content.strip()
+        return parse_meme_content(content)
             
     except Exception as e:
         st.error(f"Error generating meme content: {e}")
-        return {key: f"Error generating text" for key in schema.keys()}
+        return {key: "Error generating text" for key in schema.keys()}
+
+async def generate_many(topics_templates: List[tuple], viral_context: str = "") -> List[Dict[str, str]]:
+    """Generate meme content for several (topic, template) pairs concurrently"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    # The async client is bound to the running event loop, so create one per batch
+    async with openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as client:
+        return await asyncio.gather(*[
+            generate_meme_content_async(topic, template, client, sem, viral_context)
+            for topic, template in topics_templates
+        ])
 
 def wrap_text(text: str, font, max_width: int) -> str:
     """Wrap text to fit within the specified width"""
@@ -350,23 +620,22 @@ def wrap_text(text: str, font, max_width: int) -> str:
     words = text.split()
     lines = []
     current_line = []
+    line_width = 0
     
+    # Greedy wrap on summed glyph advances instead of re-measuring the whole candidate line per word
+    space_width = font.getlength(' ')
     for word in words:
-        # Create a test line with the current word
-        test_line = ' '.join(current_line + [word])
-        
-        # Get text width using a dummy image
-        dummy_img = Image.new('RGB', (1, 1))
-        dummy_draw = ImageDraw.Draw(dummy_img)
-        bbox = dummy_draw.textbbox((0, 0), test_line, font=font)
-        text_width = bbox[2] - bbox[0]
+        word_width = font.getlength(word)
+        added_width = word_width + space_width if current_line else word_width
         
-        if text_width <= max_width:
+        if line_width + added_width <= max_width:
             current_line.append(word)
+            line_width += added_width
         else:
             if current_line:
                 lines.append(' '.join(current_line))
                 current_line = [word]
+                line_width = word_width
             else:
                 # Single word is too long, add it anyway
                 lines.append(word)
@@ -376,135 +645,136 @@ def wrap_text(text: str, font, max_width: int) -> str:
     
     return '\n'.join(lines)
 
-def fit_text_to_bbox(text: str, font, bbox_width: int, bbox_height: int) -> tuple:
-    """Try different font sizes to fit text optimally in bounding box"""
-    if not font:
-        return str(text), font
+def fit_text_to_bbox(text: str, font_size: int, bbox_width: int, bbox_height: int) -> tuple:
+    """Find the largest font size whose wrapped text fits in the bounding box
+
+    Falls back to font_size when even the smallest candidate doesn't fit.
+    Measures with font.getlength / font.getbbox, so no scratch image is needed.
+    """
+    text = str(text)
     
-    # Try different font sizes to maximize text usage
-    font_sizes = [24, 20, 18, 16, 14, 12, 10]
+    # Candidate sizes, smallest first; a size that fits implies every smaller one does too
+    font_sizes = [10, 12, 14, 16, 18, 20, 24]
     
-    for size in font_sizes:
-        try:
-            test_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", size)
-        except:
-            test_font = font
-        
-        # Test if text fits with this font size
-        dummy_img = Image.new('RGB', (1, 1))
-        dummy_draw = ImageDraw.Draw(dummy_img)
-        
-        # Test single line first
-        bbox = dummy_draw.textbbox((0, 0), text, font=test_font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        if text_width <= bbox_width and text_height <= bbox_height:
-            return text, test_font
+    # Binary search for the largest fitting size instead of trying each in turn
+    best = None
+    low, high = 0, len(font_sizes) - 1
+    while low <= high:
+        mid = (low + high) // 2
+        test_font = load_font(FONT_PATH, font_sizes[mid])
         
-        # Test wrapped text
         wrapped = wrap_text(text, test_font, bbox_width)
-        lines = wrapped.split('\n')
-        
-        # Calculate total height for wrapped text
-        total_height = len(lines) * text_height
+        left, top, right, bottom = test_font.getbbox(text)
+        total_height = (wrapped.count('\n') + 1) * (bottom - top)
         
         if total_height <= bbox_height:
-            return wrapped, test_font
+            best = (wrapped, test_font)
+            low = mid + 1
+        else:
+            high = mid - 1
     
-    # Fallback to original
+    if best:
+        return best
+    
+    # Fallback to the requested size
+    font = load_font(FONT_PATH, font_size)
     return wrap_text(text, font, bbox_width), font
 
 def create_meme_image(template: Dict[str, Any], meme_content: Dict[str, str]) -> Image.Image:
-    """Create the final meme image by overlaying text on the template"""
+    """Create the final meme image by overlaying text on the template
+
+    Raises on failure; create_meme_jpeg reports the error.
+    """
     
     # Load the template image
     template_name = template.get('name', '')
     template_path = f"meme_templates/{template_name}.jpg"
     
-    if not os.path.exists(template_path):
-        st.error(f"Template image not found: {template_path}")
-        return None
+    # Decode the template once, then draw on a copy so the cached image stays clean
+    template_img, scale = load_template_image(template_name, template_path)
+    img = template_img.copy()
     
+    draw = ImageDraw.Draw(img)
+    
+    # Get image dimensions
+    width, height = img.size
+    
+    # Define text positions using bounding boxes
+    text_positions = get_text_positions(template, width, height, scale)
+    
+    # Add text overlay based on template
+    for field, content in meme_content.items():
+        if field in text_positions:
+            pos = text_positions[field]
+            font_size = pos.get('font_size', FONT_SIZES['small'])
+            color = pos.get('color', 'white')
+            stroke_color = pos.get('stroke_color', 'black')
+            stroke_width = pos.get('stroke_width', 2)
+            
+            # Ensure content is a string
+            content = str(content)
+            
+            # Wrap text to fit within bounding box
+            bbox = pos.get('bbox', (0, 0, width//4, height//4))
+            box_width = bbox[2]  # Width of the bounding box
+            box_height = bbox[3]  # Height of the bounding box
+            
+            # Fit text optimally to the bounding box
+            fitted_text, optimal_font = fit_text_to_bbox(content, font_size, box_width, box_height)
+            
+            # Draw text with stroke for better visibility
+            draw.text(
+                pos['position'], 
+                fitted_text, 
+                font=optimal_font, 
+                fill=color,
+                stroke_fill=stroke_color,
+                stroke_width=stroke_width,
+                anchor="mm"
+            )
+    
+    return img
+
+def encode_jpeg(image: Image.Image) -> bytes:
+    """Encode a meme as baseline JPEG at Pillow's default quality"""
+    buf = BytesIO()
+    image.save(buf, format="JPEG")
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def render_meme_jpeg(template: Dict[str, Any], meme_content: Dict[str, str], mtime: float) -> bytes:
+    """Cached create_meme_image + encode_jpeg, shared across reruns and sessions
+
+    mtime is only part of the cache key so the render is redone when the template image changes.
+    Errors propagate, so a failed render is never cached and the next attempt renders again.
+    """
+    return encode_jpeg(create_meme_image(template, meme_content))
+
+def create_meme_jpeg(template: Dict[str, Any], meme_content: Dict[str, str]) -> Optional[bytes]:
+    """Render a meme and encode it as JPEG, reusing earlier renders of the same template and text"""
+    template_path = f"meme_templates/{template.get('name', '')}.jpg"
     try:
-        # Open the template image
-        img = Image.open(template_path)
-        img = img.convert('RGB')
-        
-        # Create a copy for drawing
-        draw = ImageDraw.Draw(img)
-        
-        # Try to load a font, fallback to default if not available
-        try:
-            font_large = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 24)
-            font_medium = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 18)
-            font_small = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 14)
-        except:
-            try:
-                font_large = ImageFont.load_default()
-                font_medium = font_large
-                font_small = font_large
-            except:
-                font_large = None
-                font_medium = None
-                font_small = None
-        
-        # Get image dimensions
-        width, height = img.size
-        
-        # Define text positions using bounding boxes
-        text_positions = get_text_positions(template, width, height)
-        
-        # Add text overlay based on template
-        for field, content in meme_content.items():
-            if field in text_positions:
-                pos = text_positions[field]
-                font = pos.get('font', font_medium)
-                color = pos.get('color', 'white')
-                stroke_color = pos.get('stroke_color', 'black')
-                stroke_width = pos.get('stroke_width', 2)
-                
-                # Ensure content is a string
-                content = str(content)
-                
-                # Wrap text to fit within bounding box
-                bbox = pos.get('bbox', (0, 0, width//4, height//4))
-                box_width = bbox[2]  # Width of the bounding box
-                box_height = bbox[3]  # Height of the bounding box
-                
-                # Fit text optimally to the bounding box
-                fitted_text, optimal_font = fit_text_to_bbox(content, font, box_width, box_height)
-                
-                # Draw text with stroke for better visibility
-                draw.text(
-                    pos['position'], 
-                    fitted_text, 
-                    font=optimal_font, 
-                    fill=color,
-                    stroke_fill=stroke_color,
-                    stroke_width=stroke_width,
-                    anchor="mm"
-                )
-        
-        return img
-        
+        return render_meme_jpeg(template, meme_content, get_mtime(template_path))
+    except FileNotFoundError:
+        st.error(f"Template image not found: {template_path}")
+        return None
     except Exception as e:
         st.error(f"Error creating meme image: {e}")
         return None
 
-def create_template_with_boxes(template: Dict[str, Any]) -> Image.Image:
-    """Create a version of the template with bounding boxes drawn on it"""
-    
-    template_name = template.get('name', '')
-    template_path = f"meme_templates/{template_name}.jpg"
-    
-    if not os.path.exists(template_path):
-        return None
-    
+@st.cache_data(show_spinner=False)
+def render_template_with_boxes(template_path: str, bounding_boxes: Dict[str, Any], mtime: float) -> Tuple[Optional[bytes], Optional[str]]:
+    """Draw bounding boxes on a template image, returning (PNG bytes, error)
+
+    Cached so toggling "Show Text Areas" or other widgets doesn't redraw the preview.
+    mtime is only part of the cache key so the image is re-read when it changes.
+    """
     try:
-        # Open the template image
+        # Open the template image, converting only if it isn't already RGB
         img = Image.open(template_path)
-        img = img.convert('RGB')
+        img.draft('RGB', img.size)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
         
         # Create a copy for drawing
         draw = ImageDraw.Draw(img)
@@ -512,8 +782,8 @@ def create_template_with_boxes(template: Dict[str, Any]) -> Image.Image:
         # Get image dimensions
         width, height = img.size
         
-        # Get bounding boxes
-        bounding_boxes = template.get('bounding_boxes', {})
+        # Font for the field names
+        font = load_font(FONT_PATH, 16)
         
         # Draw bounding boxes
         for field, bbox in bounding_boxes.items():
@@ -530,18 +800,12 @@ def create_template_with_boxes(template: Dict[str, Any]) -> Image.Image:
                 width=3
             )
             
-            # Draw field name in the box
-            try:
-                font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 16)
-            except:
-                font = ImageFont.load_default()
-            
             # Calculate text position (center of box)
             text_x = x + box_width // 2
             text_y = y + box_height // 2
             
             # Draw field name with background
-            text_bbox = draw.textbbox((0, 0), field, font=font)
+            text_bbox = font.getbbox(field)
             text_width = text_bbox[2] - text_bbox[0]
             text_height = text_bbox[3] - text_bbox[1]
             
@@ -563,62 +827,67 @@ def create_template_with_boxes(template: Dict[str, Any]) -> Image.Image:
                 anchor="mm"
             )
         
-        return img
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue(), None
         
+    except FileNotFoundError:
+        return None, None
     except Exception as e:
-        st.error(f"Error creating template with boxes: {e}")
-        return None
+        return None, f"Error creating template with boxes: {e}"
+
+def create_template_with_boxes(template: Dict[str, Any]) -> Optional[bytes]:
+    """Get the template with its bounding boxes drawn on it, as PNG bytes"""
+    template_name = template.get('name', '')
+    template_path = f"meme_templates/{template_name}.jpg"
+    
+    png_bytes, error = render_template_with_boxes(
+        template_path, template.get('bounding_boxes', {}), get_mtime(template_path)
+    )
+    if error:
+        st.error(error)
+    return png_bytes
 
-def get_text_positions(template: Dict[str, Any], width: int, height: int) -> Dict[str, Dict]:
-    """Get text positions using bounding boxes from template data"""
+def get_text_positions(template: Dict[str, Any], width: int, height: int, scale: float = 1.0) -> Dict[str, Dict]:
+    """Get text positions using bounding boxes from template data, scaled by scale for resized templates"""
     
     positions = {}
     bounding_boxes = template.get('bounding_boxes', {})
     
-    # Convert font names to actual font objects
-    try:
-        font_large = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 36)
-        font_medium = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 24)
-        font_small = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 18)
-    except:
-        font_large = ImageFont.load_default()
-        font_medium = font_large
-        font_small = font_large
+    # Per-field colors for this template, e.g. {"consequence": "red"}
+    field_colors = TEMPLATE_TEXT_COLORS.get(template.get('name', ''), {})
+    default_color = field_colors.get(None, "white")
     
-    font_map = {"large": font_large, "medium": font_medium, "small": font_small}
+    # Box heights above which the larger font tiers are used
+    large_threshold = 0.3 * height
+    medium_threshold = 0.2 * height
     
     # Process each bounding box
     for field, bbox in bounding_boxes.items():
-        # Use absolute pixel coordinates directly
-        x = bbox['x']
-        y = bbox['y']
-        box_width = bbox['width']
-        box_height = bbox['height']
+        # Absolute pixel coordinates, mapped onto the resized template
+        x = round(bbox['x'] * scale)
+        y = round(bbox['y'] * scale)
+        box_width = round(bbox['width'] * scale)
+        box_height = round(bbox['height'] * scale)
         
         # Calculate center position for text
         center_x = x + box_width // 2
         center_y = y + box_height // 2
         
         # Determine font size based on bounding box size - more aggressive sizing
-        if box_height > 0.3 * height:
-            font_size = "large"
-        elif box_height > 0.2 * height:
-            font_size = "medium"
+        if box_height > large_threshold:
+            font_tier = "large"
+        elif box_height > medium_threshold:
+            font_tier = "medium"
         else:
-            font_size = "small"
+            font_tier = "small"
         
         # Determine text color based on template
-        template_name = template.get('name', '')
-        if template_name == "change_my_mind":
-            color = "black"
-        elif template_name == "uno_draw_25" and field == "consequence":
-            color = "red"
-        else:
-            color = "white"
+        color = field_colors.get(field, default_color)
         
         positions[field] = {
             "position": (center_x, center_y),
-            "font": font_map.get(font_size, font_medium),
+            "font_size": FONT_SIZES[font_tier],
             "color": color,
             "stroke_color": "black" if color == "white" else "white",
             "stroke_width": 2,
@@ -631,21 +900,23 @@ def main():
     st.title("🎭 Meme Generator")
     st.markdown("Generate hilarious memes by selecting a topic and template!")
     
-    # Check for OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
-        st.error("Please set your OPENAI_API_KEY environment variable")
-        st.stop()
+    # Create the OpenAI client once per rerun; stops the app if the API key is missing
+    client = get_openai_client()
     
     # Load data
     with st.spinner("Loading meme briefs and templates..."):
-        briefs = load_meme_briefs()
-        templates = load_meme_templates()
+        # Only the first run of a session can hit cold caches; later reruns skip the thread pool
+        if not st.session_state.get("app_data_prefetched"):
+            prefetch_app_data()
+            st.session_state["app_data_prefetched"] = True
+        briefs, topic_options = load_meme_briefs()
+        template_names = load_template_names()
     
     if not briefs:
         st.error("No meme briefs found. Please check the meme_briefs directory.")
         st.stop()
     
-    if not templates:
+    if not template_names:
         st.error("No meme templates found. Please check the memedb.jsonl file.")
         st.stop()
     
@@ -653,6 +924,7 @@ def main():
     selected_template = None
     template = None
     new_template = None
+    extra_templates = []
     
     # Create two columns
     col1, col2 = st.columns([1, 1])
@@ -661,14 +933,9 @@ def main():
         st.header("📝 Select a Topic")
         
         # Display topics
-        topic_options = {}
-        for brief in briefs:
-            search_term = brief.get('search', 'Unknown')
-            topic_options[search_term] = brief
-        
         selected_topic = st.selectbox(
             "Choose a trending topic:",
-            options=list(topic_options.keys()),
+            options=topic_options,
             key="topic_select"
         )
         
@@ -697,21 +964,15 @@ def main():
         )
         
         if template_mode == "Use Existing Template":
-            # Display existing templates
-            template_options = {}
-            for template in templates:
-                name = template.get('name', 'Unknown')
-                explanation = template.get('explanation', 'No description available')
-                template_options[name] = template
-            
+            # Display existing templates; only the selected one is parsed
             selected_template = st.selectbox(
                 "Choose a meme template:",
-                options=list(template_options.keys()),
+                options=template_names,
                 key="template_select"
             )
             
             if selected_template:
-                template = template_options[selected_template]
+                template = load_template_by_name(selected_template)
                 st.info(f"**Template:** {selected_template}")
                 st.caption(template.get('explanation', 'No description available'))
                 
@@ -736,8 +997,13 @@ def main():
                 schema = template.get('schema', {})
                 if schema:
                     st.subheader("Template Fields:")
-                    for field, desc in schema.items():
-                        st.text(f"• {field}: {desc.get('description', 'No description')}")
+                    st.text("\n".join(template_field_lines(schema)))
+                
+                extra_templates = st.multiselect(
+                    "Also generate with:",
+                    options=[name for name in template_names if name != selected_template],
+                    help="Generate the same topic with other templates in a single request"
+                )
         
         else:  # Create New Template
             st.subheader("📸 Create New Meme Template")
@@ -781,8 +1047,6 @@ def main():
                 if st.button("🔍 Analyze Image & Create Template", type="primary"):
                     with st.spinner("Analyzing image with AI..."):
                         st.info("Starting image analysis...")
-                        client = get_openai_client()
-                        st.info("OpenAI client initialized")
                         
                         new_template = analyze_image_for_meme_template(image, template_description, client)
                         
@@ -855,58 +1119,91 @@ def main():
                 schema = template.get('schema', {})
                 if schema:
                     st.subheader("Template Fields:")
-                    for field, desc in schema.items():
-                        st.text(f"• {field}: {desc.get('description', 'No description')}")
+                    st.text("\n".join(template_field_lines(schema)))
     
     # Generate meme button
     st.markdown("---")
     
+    variations = st.number_input(
+        "Number of variations:",
+        min_value=1,
+        max_value=MAX_CONCURRENT_REQUESTS,
+        value=1,
+        help="Generate several versions of the meme at once (single template only)"
+    )
+    
+    force_regenerate = st.checkbox(
+        "Force regenerate",
+        help="Ignore previously generated text for this topic and template"
+    )
+    
+    # Inputs that identify a generated meme; a rerun with the same inputs reuses the last result
+    meme_key = (
+        selected_topic,
+        template.get('name') if template else None,
+        tuple(extra_templates),
+        variations,
+    )
+    
     if st.button("🎭 Generate Meme!", type="primary"):
+        prev = st.session_state.get("last_meme")
         if not selected_topic:
             st.error("Please select a topic!")
         elif template_mode == "Use Existing Template" and not selected_template:
             st.error("Please select a template!")
         elif template_mode == "Create New Template" and not template:
             st.error("Please create a new template first!")
+        elif prev and prev["key"] == meme_key and not force_regenerate:
+            st.info("Inputs unchanged, showing the last generated meme. Tick \"Force regenerate\" for a new one.")
         else:
             with st.spinner("Generating your meme..."):
-                client = get_openai_client()
                 brief = topic_options[selected_topic]
                 
-                # Get template based on mode
-                if template_mode == "Use Existing Template":
-                    template = template_options[selected_template]
-                
                 # Generate meme content with viral context
                 viral_context = brief.get('explanation', '') + " " + brief.get('detailed_reason', '')
-                meme_content = generate_meme_content(selected_topic, template, client, viral_context)
-                
-                # Display generated content
-                st.subheader("Generated Meme Content:")
-                for field, content in meme_content.items():
-                    st.text(f"**{field}:** {content}")
+                if extra_templates:
+                    # One request covers every selected template
+                    chosen_templates = [template] + [load_template_by_name(name) for name in extra_templates]
+                    bulk_contents = generate_memes_bulk(selected_topic, chosen_templates, client, viral_context)
+                    memes = [(t, bulk_contents[t['name']]) for t in chosen_templates]
+                elif variations == 1:
+                    memes = [(template, generate_meme_content(selected_topic, template, client, viral_context, use_cache=not force_regenerate))]
+                else:
+                    # Dispatch all variations concurrently instead of one request after another
+                    meme_contents = asyncio.run(generate_many([(selected_topic, template)] * variations, viral_context))
+                    memes = [(template, meme_content) for meme_content in meme_contents]
                 
-                # Create and display the meme image
-                meme_image = create_meme_image(template, meme_content)
+                # Render and encode once; later reruns (e.g. clicking Download) reuse the JPEG bytes
+                rendered_memes = [
+                    (meme_template, meme_content, create_meme_jpeg(meme_template, meme_content))
+                    for meme_template, meme_content in memes
+                ]
+                st.session_state["last_meme"] = {"key": meme_key, "memes": rendered_memes}
+    
+    last_meme = st.session_state.get("last_meme")
+    if last_meme and last_meme["key"] == meme_key:
+        memes = last_meme["memes"]
+        for i, (meme_template, meme_content, meme_jpeg) in enumerate(memes, 1):
+            # Display generated content
+            st.subheader("Generated Meme Content:")
+            for field, content in meme_content.items():
+                st.text(f"**{field}:** {content}")
+            
+            if meme_jpeg:
+                st.subheader("Your Meme:")
+                col1, col2 = st.columns([1, 1])
+                with col1:
+                    st.image(meme_jpeg, caption=f"Meme about {selected_topic}", use_container_width=True)
                 
-                if meme_image:
-                    st.subheader("Your Meme:")
-                    col1, col2 = st.columns([1, 1])
-                    with col1:
-                        st.image(meme_image, caption=f"Meme about {selected_topic}", use_container_width=True)
-                    
-                    # Add download button
-                    from io import BytesIO
-                    buf = BytesIO()
-                    meme_image.save(buf, format="JPEG")
-                    byte_im = buf.getvalue()
-                    
-                    st.download_button(
-                        label="Download Meme",
-                        data=byte_im,
-                        file_name=f"{selected_topic}_{selected_template}_meme.jpg",
-                        mime="image/jpeg"
-                    )
+                # Add download button
+                suffix = f"_{i}" if len(memes) > 1 else ""
+                st.download_button(
+                    label="Download Meme",
+                    data=meme_jpeg,
+                    file_name=f"{selected_topic}_{meme_template.get('name', selected_template)}_meme{suffix}.jpg",
+                    mime="image/jpeg",
+                    key=f"download_meme{suffix}"
+                )
 
 if __name__ == "__main__":
     main()
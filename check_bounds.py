@@ -3,9 +3,10 @@
 Script to check which bounding boxes extend outside image bounds.
 """
 
-import json
 from typing import Dict, List, Any
 
+import orjson
+
 
 def check_box_bounds(box: Dict[str, float], box_name: str, meme_name: str) -> List[str]:
     """Check if a bounding box extends outside 0-1 bounds."""
@@ -35,14 +36,14 @@ def main():
     
     all_issues = []
     
-    with open("/Users/jaychia/code/coinmeme/memedb.jsonl", 'r') as f:
+    with open("/Users/jaychia/code/coinmeme/memedb.jsonl", 'rb') as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
             if not line:
                 continue
             
             try:
-                meme_data = json.loads(line)
+                meme_data = orjson.loads(line)
                 meme_name = meme_data.get('name', f'line_{line_num}')
                 bounding_boxes = meme_data.get('bounding_boxes', {})
                 
@@ -50,7 +51,7 @@ def main():
                     issues = check_box_bounds(box, box_name, meme_name)
                     all_issues.extend(issues)
                     
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 print(f"❌ Error parsing line {line_num}: {e}")
                 continue
     
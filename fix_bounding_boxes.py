@@ -6,46 +6,39 @@ Bounding boxes should not overlap and should fit within the image bounds (0-1).
 
 import json
 import math
+import os
+import tempfile
 from typing import Dict, List, Tuple, Any
 
+import orjson
 
-def boxes_overlap(box1: Dict[str, float], box2: Dict[str, float]) -> bool:
-    """Check if two bounding boxes overlap."""
-    # Calculate boundaries
-    box1_left = box1['x'] - box1['width'] / 2
-    box1_right = box1['x'] + box1['width'] / 2
-    box1_top = box1['y'] - box1['height'] / 2
-    box1_bottom = box1['y'] + box1['height'] / 2
-    
-    box2_left = box2['x'] - box2['width'] / 2
-    box2_right = box2['x'] + box2['width'] / 2
-    box2_top = box2['y'] - box2['height'] / 2
-    box2_bottom = box2['y'] + box2['height'] / 2
-    
-    # Check for overlap
-    return not (box1_right <= box2_left or box2_right <= box1_left or 
-                box1_bottom <= box2_top or box2_bottom <= box1_top)
 
+def box_edges(box: Dict[str, float]) -> Tuple[float, float, float, float]:
+    """Get the (left, right, top, bottom) edges of a center-based bounding box."""
+    half_width = box['width'] / 2
+    half_height = box['height'] / 2
+    return (box['x'] - half_width, box['x'] + half_width,
+            box['y'] - half_height, box['y'] + half_height)
 
-def get_overlap_area(box1: Dict[str, float], box2: Dict[str, float]) -> float:
-    """Calculate the area of overlap between two boxes."""
-    if not boxes_overlap(box1, box2):
-        return 0.0
-    
-    # Calculate boundaries
-    box1_left = box1['x'] - box1['width'] / 2
-    box1_right = box1['x'] + box1['width'] / 2
-    box1_top = box1['y'] - box1['height'] / 2
-    box1_bottom = box1['y'] + box1['height'] / 2
-    
-    box2_left = box2['x'] - box2['width'] / 2
-    box2_right = box2['x'] + box2['width'] / 2
-    box2_top = box2['y'] - box2['height'] / 2
-    box2_bottom = box2['y'] + box2['height'] / 2
+
+def boxes_overlap(edges1: Tuple[float, float, float, float], edges2: Tuple[float, float, float, float]) -> bool:
+    """Check if two bounding boxes, given as box_edges tuples, overlap."""
+    left1, right1, top1, bottom1 = edges1
+    left2, right2, top2, bottom2 = edges2
+    return not (right1 <= left2 or right2 <= left1 or
+                bottom1 <= top2 or bottom2 <= top1)
+
+
+def get_overlap_area(edges1: Tuple[float, float, float, float], edges2: Tuple[float, float, float, float]) -> float:
+    """Calculate the area of overlap between two boxes given as box_edges tuples (0 if they don't overlap)."""
+    left1, right1, top1, bottom1 = edges1
+    left2, right2, top2, bottom2 = edges2
     
-    # Calculate overlap dimensions
-    overlap_width = min(box1_right, box2_right) - max(box1_left, box2_left)
-    overlap_height = min(box1_bottom, box2_bottom) - max(box1_top, box2_top)
+    # Calculate overlap dimensions; either one is <= 0 when the boxes don't overlap
+    overlap_width = min(right1, right2) - max(left1, left2)
+    overlap_height = min(bottom1, bottom2) - max(top1, top2)
+    if overlap_width <= 0 or overlap_height <= 0:
+        return 0.0
     
     return overlap_width * overlap_height
 
@@ -58,6 +51,9 @@ def fix_overlapping_boxes(bounding_boxes: Dict[str, Dict[str, float]]) -> Dict[s
     fixed_boxes = bounding_boxes.copy()
     box_names = list(fixed_boxes.keys())
     
+    # Box edges, refreshed whenever a box moves
+    edges = {name: box_edges(box) for name, box in fixed_boxes.items()}
+    
     # Find all overlapping pairs
     overlaps_found = True
     max_iterations = 20
@@ -74,7 +70,7 @@ def fix_overlapping_boxes(bounding_boxes: Dict[str, Dict[str, float]]) -> Dict[s
                 box1 = fixed_boxes[box1_name]
                 box2 = fixed_boxes[box2_name]
                 
-                if boxes_overlap(box1, box2):
+                if boxes_overlap(edges[box1_name], edges[box2_name]):
                     overlaps_found = True
                     
                     # Calculate center-to-center distance
@@ -114,6 +110,9 @@ def fix_overlapping_boxes(bounding_boxes: Dict[str, Dict[str, float]]) -> Dict[s
                         
                         box['x'] = max(min_x, min(max_x, box['x']))
                         box['y'] = max(min_y, min(max_y, box['y']))
+                    
+                    edges[box1_name] = box_edges(box1)
+                    edges[box2_name] = box_edges(box2)
     
     return fixed_boxes
 
@@ -128,6 +127,9 @@ def analyze_meme_boxes(meme_data: Dict[str, Any]) -> Dict[str, Any]:
     if not boxes:
         return {"name": name, "issues": ["No bounding boxes defined"], "overlaps": []}
     
+    # Compute each box's edges once
+    edges = {box_name: box_edges(box) for box_name, box in boxes.items()}
+    
     # Check for overlaps
     overlaps = []
     box_names = list(boxes.keys())
@@ -136,23 +138,16 @@ def analyze_meme_boxes(meme_data: Dict[str, Any]) -> Dict[str, Any]:
         for j in range(i + 1, len(box_names)):
             box1_name = box_names[i]
             box2_name = box_names[j]
-            box1 = boxes[box1_name]
-            box2 = boxes[box2_name]
             
-            if boxes_overlap(box1, box2):
-                overlap_area = get_overlap_area(box1, box2)
+            overlap_area = get_overlap_area(edges[box1_name], edges[box2_name])
+            if overlap_area > 0:
                 overlaps.append({
                     "boxes": [box1_name, box2_name],
                     "overlap_area": round(overlap_area, 4)
                 })
     
     # Check for out-of-bounds boxes
-    for box_name, box in boxes.items():
-        left = box['x'] - box['width'] / 2
-        right = box['x'] + box['width'] / 2
-        top = box['y'] - box['height'] / 2
-        bottom = box['y'] + box['height'] / 2
-        
+    for box_name, (left, right, top, bottom) in edges.items():
         if left < 0 or right > 1 or top < 0 or bottom > 1:
             issues.append(f"{box_name} extends outside image bounds")
     
@@ -171,28 +166,54 @@ def main():
     
     print("🔍 Analyzing memedb.jsonl for bounding box issues...")
     
-    # Read and analyze the data
-    memes = []
+    # Analyze, fix and write each meme as it's read, keeping only the reports in memory;
+    # output goes to a temporary file that only replaces output_file if something was fixed
     issues_found = []
+    fix_reports = []
     
-    with open(input_file, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                meme_data = json.loads(line)
-                memes.append(meme_data)
+    out = tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(output_file), suffix='.tmp', delete=False)
+    try:
+        with open(input_file, 'rb') as f, out:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                
+                try:
+                    meme_data = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    print(f"❌ Error parsing line {line_num}: {e}")
+                    continue
                 
                 # Analyze this meme's boxes
                 analysis = analyze_meme_boxes(meme_data)
                 if analysis['issues'] or analysis['overlaps']:
                     issues_found.append(analysis)
+                
+                # fix_overlapping_boxes only moves overlapping boxes, so skip its sweep when
+                # the analysis above found none
+                if analysis['overlaps']:
+                    # Record positions up front; fix_overlapping_boxes moves the box dicts in place
+                    original_positions = {box_name: (box['x'], box['y']) for box_name, box in meme_data['bounding_boxes'].items()}
+                    fixed_boxes = fix_overlapping_boxes(meme_data['bounding_boxes'])
+                    meme_data['bounding_boxes'] = fixed_boxes
                     
-            except json.JSONDecodeError as e:
-                print(f"❌ Error parsing line {line_num}: {e}")
-                continue
+                    # Record what was changed
+                    changes = []
+                    for box_name, (orig_x, orig_y) in original_positions.items():
+                        fixed = fixed_boxes[box_name]
+                        if (abs(orig_x - fixed['x']) > 0.001 or 
+                            abs(orig_y - fixed['y']) > 0.001):
+                            changes.append(f"  📦 {box_name}: ({orig_x:.3f}, {orig_y:.3f}) → ({fixed['x']:.3f}, {fixed['y']:.3f})")
+                    if changes:
+                        fix_reports.append((meme_data['name'], changes))
+                
+                # stdlib json keeps the spaced format the rest of memedb.jsonl uses
+                out.write(json.dumps(meme_data).encode() + b'\n')
+    except BaseException:
+        # Don't leave a stray temporary file next to output_file
+        os.remove(out.name)
+        raise
     
     print(f"📊 Found {len(issues_found)} memes with bounding box issues:")
     print()
@@ -211,40 +232,22 @@ def main():
         print()
     
     if total_overlaps == 0:
+        os.remove(out.name)
         print("✅ No overlapping bounding boxes found!")
         return
     
     print(f"🔧 Fixing {total_overlaps} overlapping bounding box pairs...")
     print()
     
-    # Fix the issues
-    fixed_memes = []
-    for meme_data in memes:
-        if 'bounding_boxes' in meme_data and meme_data['bounding_boxes']:
-            original_boxes = meme_data['bounding_boxes'].copy()
-            fixed_boxes = fix_overlapping_boxes(meme_data['bounding_boxes'])
-            meme_data['bounding_boxes'] = fixed_boxes
-            
-            # Report what was changed
-            changed = False
-            for box_name in original_boxes:
-                orig = original_boxes[box_name]
-                fixed = fixed_boxes[box_name]
-                if (abs(orig['x'] - fixed['x']) > 0.001 or 
-                    abs(orig['y'] - fixed['y']) > 0.001):
-                    if not changed:
-                        print(f"🔄 Fixed {meme_data['name']}:")
-                        changed = True
-                    print(f"  📦 {box_name}: ({orig['x']:.3f}, {orig['y']:.3f}) → ({fixed['x']:.3f}, {fixed['y']:.3f})")
-            if changed:
-                print()
-        
-        fixed_memes.append(meme_data)
+    # Report what was changed
+    for name, changes in fix_reports:
+        print(f"🔄 Fixed {name}:")
+        for change in changes:
+            print(change)
+        print()
     
-    # Write the fixed data
-    with open(output_file, 'w') as f:
-        for meme_data in fixed_memes:
-            f.write(json.dumps(meme_data) + '\n')
+    # Keep the fixed data
+    os.replace(out.name, output_file)
     
     print(f"✅ Fixed bounding boxes saved to: {output_file}")
     print("🔄 To apply changes, run: mv memedb_fixed.jsonl memedb.jsonl")
@@ -2,39 +2,81 @@
 """
 Script to use OpenAI Vision API to analyze meme template images and generate
 accurate bounding boxes for text placement regions.
+
+Pass --batch to submit all requests as one OpenAI Batch API job instead
+(half the cost, but results can take up to 24 hours).
 """
 
 import base64
+import hashlib
 import json
 import os
-from typing import Dict, List, Any
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 
-from openai import OpenAI
+import orjson
+from openai import OpenAI, RateLimitError
 from PIL import Image
 
 
-def encode_image(image_path: str) -> str:
-    """Encode image to base64 for OpenAI API."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# Number of memes analyzed concurrently
+MAX_WORKERS = 8
 
+# Seconds to wait before each retry of a rate-limited request
+RETRY_DELAYS = (1, 2, 4)
 
-def get_image_dimensions(image_path: str) -> tuple[int, int]:
-    """Get image width and height."""
-    with Image.open(image_path) as img:
-        return img.size
+# Longest side, in pixels, of images sent for analysis; larger templates are downscaled
+MAX_IMAGE_EDGE = 1024
 
+# Images no larger than this are sent at detail="low", which already sees them at full size
+LOW_DETAIL_EDGE = 512
 
-def analyze_meme_with_openai(image_path: str, meme_name: str, schema: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
-    """Use OpenAI Vision to analyze a meme image and identify text placement regions."""
-    
-    if not os.environ.get("OPENAI_API_KEY"):
-        raise ValueError("OPENAI_API_KEY environment variable is required")
+# Directory of generated bounding boxes, keyed by a hash of the analysis request
+VISION_CACHE_DIR = ".vision_cache"
+
+# Seconds between Batch API status checks, and the statuses a batch can't leave
+BATCH_POLL_SECONDS = 30
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def encode_image(image_path: str) -> Tuple[str, Tuple[int, int]]:
+    """Encode image to base64 for OpenAI API, returning it with the encoded image's size.
+
+    Images larger than MAX_IMAGE_EDGE are downscaled first; smaller ones are sent as-is.
+    """
+    # Read the file once; PIL only needs the header to size it when no resize is needed
+    with open(image_path, "rb") as image_file:
+        image_bytes = image_file.read()
     
-    client = OpenAI()
-    base64_image = encode_image(image_path)
-    width, height = get_image_dimensions(image_path)
+    with Image.open(BytesIO(image_bytes)) as img:
+        if max(img.size) <= MAX_IMAGE_EDGE:
+            return base64.b64encode(image_bytes).decode('ascii'), img.size
+        
+        img = img.convert("RGB")
+        img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.Resampling.LANCZOS)
+        buffered = BytesIO()
+        img.save(buffered, format="JPEG", quality=85)
+        return base64.b64encode(buffered.getvalue()).decode('ascii'), img.size
+
+
+def create_with_backoff(client: OpenAI, **kwargs):
+    """Create a chat completion, retrying with exponential backoff when rate limited."""
+    for delay in RETRY_DELAYS:
+        try:
+            return client.chat.completions.create(**kwargs)
+        except RateLimitError:
+            time.sleep(delay)
+    return client.chat.completions.create(**kwargs)
+
+
+def build_analysis_request(image_path: str, meme_name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the chat completion request body asking OpenAI Vision for a meme's text regions."""
+    base64_image, (width, height) = encode_image(image_path)
     
     # Create schema description for the prompt
     schema_desc = ""
@@ -79,112 +121,253 @@ Provide coordinates for: {', '.join(schema.keys())}
 
 REMEMBER: Look at the actual image to see where text typically goes in this meme format!"""
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}",
-                                "detail": "high"
-                            }
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}",
+                            "detail": "low" if max(width, height) <= LOW_DETAIL_EDGE else "high"
                         }
-                    ]
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.1
+    }
+
+
+def parse_bounding_boxes(content: str, meme_name: str, schema: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Parse and validate the bounding boxes in an OpenAI Vision response."""
+    content = content.strip()
+    
+    # Try to extract JSON from the response
+    try:
+        # Remove any markdown code blocks
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].strip()
+        
+        bounding_boxes = orjson.loads(content)
+        
+        # Remove reasoning field and validate structure
+        cleaned_boxes = {}
+        for field_name, box_data in bounding_boxes.items():
+            if field_name in schema:
+                # Extract and validate coordinates
+                x = float(box_data.get("x", 0.5))
+                y = float(box_data.get("y", 0.5))
+                width = float(box_data.get("width", 0.3))
+                height = float(box_data.get("height", 0.1))
+                
+                # Enforce size constraints
+                width = max(0.2, min(0.8, width))
+                height = max(0.05, min(0.2, height))
+                
+                # Ensure box stays completely within bounds
+                min_x = width / 2
+                max_x = 1.0 - width / 2
+                min_y = height / 2
+                max_y = 1.0 - height / 2
+                
+                x = max(min_x, min(max_x, x))
+                y = max(min_y, min(max_y, y))
+                
+                # Double-check bounds (safety)
+                left = x - width / 2
+                right = x + width / 2
+                top = y - height / 2
+                bottom = y + height / 2
+                
+                if left < 0 or right > 1 or top < 0 or bottom > 1:
+                    print(f"⚠️  Correcting out-of-bounds box for {field_name}")
+                    # Recalculate with stricter bounds
+                    width = min(width, 0.6)
+                    height = min(height, 0.15)
+                    x = max(width/2 + 0.05, min(1 - width/2 - 0.05, x))
+                    y = max(height/2 + 0.05, min(1 - height/2 - 0.05, y))
+                
+                cleaned_boxes[field_name] = {
+                    "x": round(x, 3),
+                    "y": round(y, 3), 
+                    "width": round(width, 3),
+                    "height": round(height, 3)
                 }
-            ],
-            max_tokens=1000,
-            temperature=0.1
-        )
         
-        content = response.choices[0].message.content.strip()
+        return cleaned_boxes
         
-        # Try to extract JSON from the response
-        try:
-            # Remove any markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            
-            bounding_boxes = json.loads(content)
-            
-            # Remove reasoning field and validate structure
-            cleaned_boxes = {}
-            for field_name, box_data in bounding_boxes.items():
-                if field_name in schema:
-                    # Extract and validate coordinates
-                    x = float(box_data.get("x", 0.5))
-                    y = float(box_data.get("y", 0.5))
-                    width = float(box_data.get("width", 0.3))
-                    height = float(box_data.get("height", 0.1))
-                    
-                    # Enforce size constraints
-                    width = max(0.2, min(0.8, width))
-                    height = max(0.05, min(0.2, height))
-                    
-                    # Ensure box stays completely within bounds
-                    min_x = width / 2
-                    max_x = 1.0 - width / 2
-                    min_y = height / 2
-                    max_y = 1.0 - height / 2
-                    
-                    x = max(min_x, min(max_x, x))
-                    y = max(min_y, min(max_y, y))
-                    
-                    # Double-check bounds (safety)
-                    left = x - width / 2
-                    right = x + width / 2
-                    top = y - height / 2
-                    bottom = y + height / 2
-                    
-                    if left < 0 or right > 1 or top < 0 or bottom > 1:
-                        print(f"⚠️  Correcting out-of-bounds box for {field_name}")
-                        # Recalculate with stricter bounds
-                        width = min(width, 0.6)
-                        height = min(height, 0.15)
-                        x = max(width/2 + 0.05, min(1 - width/2 - 0.05, x))
-                        y = max(height/2 + 0.05, min(1 - height/2 - 0.05, y))
-                    
-                    cleaned_boxes[field_name] = {
-                        "x": round(x, 3),
-                        "y": round(y, 3), 
-                        "width": round(width, 3),
-                        "height": round(height, 3)
-                    }
-            
-            return cleaned_boxes
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse JSON from OpenAI response for {meme_name}: {e}")
-            print(f"Response content: {content}")
-            return {}
+    except orjson.JSONDecodeError as e:
+        print(f"❌ Failed to parse JSON from OpenAI response for {meme_name}: {e}")
+        print(f"Response content: {content}")
+        return {}
+
+
+def request_cache_key(request: Dict[str, Any]) -> str:
+    """Hash an analysis request (prompt, schema and image data) into a cache key."""
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def load_cached_bounding_boxes(key: str) -> Optional[Dict[str, Dict[str, float]]]:
+    """Return bounding boxes previously generated for this request key, if any."""
+    try:
+        with open(os.path.join(VISION_CACHE_DIR, f"{key}.json"), 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def store_cached_bounding_boxes(key: str, bounding_boxes: Dict[str, Dict[str, float]]):
+    """Persist generated bounding boxes so unchanged templates skip the API on the next run.
+
+    A failed write is only logged: the boxes are still returned, they just aren't cached.
+    """
+    try:
+        os.makedirs(VISION_CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so concurrent workers never read a partial entry
+        with tempfile.NamedTemporaryFile('wb', dir=VISION_CACHE_DIR, suffix='.tmp', delete=False) as f:
+            f.write(orjson.dumps(bounding_boxes))
+        os.replace(f.name, os.path.join(VISION_CACHE_DIR, f"{key}.json"))
+    except OSError as e:
+        print(f"⚠️  Could not cache bounding boxes: {e}")
+
+
+def analyze_meme_with_openai(client: OpenAI, image_path: str, meme_name: str, schema: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Use OpenAI Vision to analyze a meme image and identify text placement regions.
+
+    Results are cached in VISION_CACHE_DIR, keyed on the request, so a template is only
+    re-analyzed when its image, name or schema changes. The client is shared by all
+    workers so they reuse one connection pool.
+    """
+    
+    try:
+        request = build_analysis_request(image_path, meme_name, schema)
+        cache_key = request_cache_key(request)
+        cached_boxes = load_cached_bounding_boxes(cache_key)
+        if cached_boxes is not None:
+            return cached_boxes
+        
+        response = create_with_backoff(client, **request)
+        bounding_boxes = parse_bounding_boxes(response.choices[0].message.content, meme_name, schema)
+        if bounding_boxes:
+            store_cached_bounding_boxes(cache_key, bounding_boxes)
+        return bounding_boxes
     
     except Exception as e:
         print(f"❌ Error analyzing {meme_name} with OpenAI: {e}")
         return {}
 
 
+def analyze_memes_with_batch(tasks: List[Tuple[Dict[str, Any], str, Dict[str, Any]]]) -> List[Dict[str, Dict[str, float]]]:
+    """Analyze (meme, image_path, schema) tasks in one OpenAI Batch API job.
+
+    Batch requests cost half as much as regular ones but can take up to 24 hours,
+    so this blocks while polling. Tasks with cached results are left out of the batch.
+    Returns bounding boxes in task order ({} on failure).
+    """
+    client = OpenAI()
+    results = [{} for _ in tasks]
+    
+    # One request per line; custom_id is the task's position so results can be matched back
+    lines = []
+    cache_keys = {}
+    for i, (meme, image_path, schema) in enumerate(tasks):
+        request = build_analysis_request(image_path, meme.get("name", ""), schema)
+        cache_keys[i] = request_cache_key(request)
+        cached_boxes = load_cached_bounding_boxes(cache_keys[i])
+        if cached_boxes is not None:
+            results[i] = cached_boxes
+            continue
+        
+        lines.append(orjson.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": request
+        }))
+    
+    if not lines:
+        print("💾 All memes already analyzed, nothing to submit")
+        return results
+    
+    batch_file = client.files.create(file=("bounding_boxes.jsonl", b"\n".join(lines)), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"📨 Submitted batch {batch.id} ({len(lines)} of {len(tasks)} memes, the rest are cached)")
+    
+    while batch.status not in BATCH_FINAL_STATUSES:
+        time.sleep(BATCH_POLL_SECONDS)
+        batch = client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        done = f"{counts.completed}/{counts.total}" if counts else "?"
+        print(f"   ⏳ {batch.status} ({done} done)")
+    
+    # Successful requests land in the output file and failed ones in the error file
+    result_file_ids = [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+    if batch.status != "completed" or not result_file_ids:
+        print(f"❌ Batch {batch.id} ended with status: {batch.status}")
+        return results
+    
+    for file_id in result_file_ids:
+        for line in client.files.content(file_id).content.splitlines():
+            if not line.strip():
+                continue
+            
+            # Any malformed line (bad JSON, unknown custom_id, no choices, null content, ...)
+            # leaves {} for its meme like any other failure, rather than aborting the loop
+            meme_name = "unknown meme"
+            try:
+                result = orjson.loads(line)
+                i = int(result["custom_id"])
+                meme, image_path, schema = tasks[i]
+                meme_name = meme.get("name", "")
+                response = result.get("response") or {}
+                if response.get("status_code") != 200:
+                    print(f"❌ Error analyzing {meme_name} with OpenAI: {result.get('error') or response.get('body')}")
+                    continue
+                
+                content = response["body"]["choices"][0]["message"]["content"]
+                results[i] = parse_bounding_boxes(content, meme_name, schema)
+            except Exception as e:
+                print(f"❌ Error analyzing {meme_name} with OpenAI: {e}")
+                continue
+            
+            if results[i]:
+                store_cached_bounding_boxes(cache_keys[i], results[i])
+    
+    return results
+
+
+def normalize_meme_name(name: str) -> str:
+    """Normalize a meme or image file name for matching (lowercase, underscores for spaces and dashes)."""
+    return name.lower().replace("-", "_").replace(" ", "_")
+
+
 def load_meme_database() -> List[Dict[str, Any]]:
     """Load the current meme database."""
     memes = []
-    with open("/Users/jaychia/code/coinmeme/memedb.jsonl", 'r') as f:
+    with open("/Users/jaychia/code/coinmeme/memedb.jsonl", 'rb') as f:
         for line in f:
             line = line.strip()
             if line:
-                memes.append(json.loads(line))
+                memes.append(orjson.loads(line))
     return memes
 
 
 def save_meme_database(memes: List[Dict[str, Any]], output_file: str):
-    """Save the updated meme database."""
-    with open(output_file, 'w') as f:
+    """Save the updated meme database, in the spaced stdlib json format memedb.jsonl uses."""
+    with open(output_file, 'wb') as f:
         for meme in memes:
-            f.write(json.dumps(meme) + '\n')
+            f.write(json.dumps(meme).encode() + b'\n')
 
 
 def main():
@@ -204,55 +387,68 @@ def main():
     image_mapping = {}
     for image_file in meme_templates_dir.glob("*.jpg"):
         # Convert filename to match meme names
-        name = image_file.stem.lower().replace("-", "_").replace(" ", "_")
-        image_mapping[name] = str(image_file)
+        image_mapping[normalize_meme_name(image_file.stem)] = str(image_file)
     
     print(f"📁 Found {len(image_mapping)} image files")
     print(f"📊 Processing {len(memes)} meme definitions")
     print()
     
-    updated_memes = []
-    
+    # Find the memes that can be analyzed
+    tasks = []
     for meme in memes:
         meme_name = meme.get("name", "")
         schema = meme.get("schema", {})
         
-        # Find matching image file
-        image_path = None
-        for img_name, img_path in image_mapping.items():
-            if meme_name.lower() in img_name or img_name in meme_name.lower():
-                image_path = img_path
-                break
+        # Find matching image file; templates are normally saved under their own name,
+        # so only fall back to a substring scan when there's no exact match
+        image_path = image_mapping.get(normalize_meme_name(meme_name))
+        if not image_path:
+            for img_name, img_path in image_mapping.items():
+                if meme_name.lower() in img_name or img_name in meme_name.lower():
+                    image_path = img_path
+                    break
         
         if not image_path:
             print(f"⚠️  No image file found for meme: {meme_name}")
-            updated_memes.append(meme)
             continue
         
         if not schema:
             print(f"⚠️  No schema found for meme: {meme_name}")
-            updated_memes.append(meme)
             continue
         
-        print(f"🎭 Analyzing {meme_name}...")
+        tasks.append((meme, image_path, schema))
+    
+    if "--batch" in sys.argv[1:]:
+        print(f"🎭 Analyzing {len(tasks)} memes with the Batch API...")
+        print()
+        results = analyze_memes_with_batch(tasks)
+    else:
+        print(f"🎭 Analyzing {len(tasks)} memes ({MAX_WORKERS} at a time)...")
+        print()
+        
+        # Analyze with OpenAI; the requests are network-bound, so run them concurrently
+        client = OpenAI()
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            results = list(executor.map(
+                lambda task: analyze_meme_with_openai(client, task[1], task[0].get("name", ""), task[2]),
+                tasks
+            ))
+    
+    for (meme, image_path, schema), new_bounding_boxes in zip(tasks, results):
+        print(f"🎭 {meme.get('name', '')}")
         print(f"   📁 Image: {Path(image_path).name}")
         print(f"   📝 Fields: {', '.join(schema.keys())}")
         
-        # Analyze with OpenAI
-        new_bounding_boxes = analyze_meme_with_openai(image_path, meme_name, schema)
-        
         if new_bounding_boxes:
             print(f"   ✅ Generated bounding boxes for {len(new_bounding_boxes)} fields")
             meme["bounding_boxes"] = new_bounding_boxes
         else:
             print(f"   ❌ Failed to generate bounding boxes")
-        
-        updated_memes.append(meme)
         print()
     
     # Save updated database
     output_file = "/Users/jaychia/code/coinmeme/memedb_ai_generated.jsonl"
-    save_meme_database(updated_memes, output_file)
+    save_meme_database(memes, output_file)
     
     print(f"✅ Updated meme database saved to: {output_file}")
     print("🔄 To apply changes, run: mv memedb_ai_generated.jsonl memedb.jsonl")
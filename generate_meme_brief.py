@@ -1,13 +1,31 @@
 import requests
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pytrends.request import TrendReq # type: ignore
 import pandas as pd
 import json
 from dotenv import load_dotenv
 
+CUSTOM_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
 def main():
     print("Hello from coinmeme!")
 
+def fetch_image_links(session, trend, api_key, cse_id, num_results=3):
+    # fetch multiple images from google custom search based on trend search word
+    params = {
+        "key": api_key,
+        "cx": cse_id,
+        "q": trend,
+        "searchType": "image",
+        "num": num_results
+    }
+
+    response = session.get(CUSTOM_SEARCH_URL, params=params)
+    data = response.json()
+
+    return [item["link"] for item in data.get("items", [])]
+
 def generate_meme_brief():
     # pull top trends from google trends and create briefs per trend 
 
@@ -30,28 +48,20 @@ def generate_meme_brief():
         api_key = os.getenv("GOOGLE_API_KEY")
         cse_id = os.getenv("CSE_ID")
         num_results = 3
+        rows = list(top_25.itertuples(index=False))
 
-        for i, row in enumerate(top_25.itertuples(index=False)):
+        # one session reuses pooled connections instead of a new TLS handshake per trend,
+        # and the searches run concurrently since each one is just waiting on the network
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=8) as executor:
+            image_prompts = list(executor.map(lambda row: fetch_image_links(session, row.Trends, api_key, cse_id, num_results), rows))
+
+        for i, (row, image_prompt) in enumerate(zip(rows, image_prompts)):
             # Create a JSON for each trend
             trend = row.Trends
             start_trending = row.Started
             end_trending = row.Ended
             description = row.Description
 
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
-                "key": api_key,
-                "cx": cse_id,
-                "q": trend,
-                "searchType": "image",
-                "num": num_results
-            }
-
-            response = requests.get(url, params=params)
-            data = response.json()
-
-            image_prompt = [item["link"] for item in data.get("items", [])] # fetch multiple images from google custom search based on trend search word
-
             with open(f"meme_briefs/brief_{i}.json", "w", encoding="utf-8") as f:
                 data = {
                     "search": trend,
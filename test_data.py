@@ -1,57 +1,109 @@
 #!/usr/bin/env python3
 """
 Test script to verify data loading works correctly
+
+Pass --fail-fast to stop the template image check at the first missing image.
 """
 
+import functools
 import json
+import mmap
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+def load_brief(filepath):
+    """Load a single meme brief, returning (brief, error)
+
+    Uses the stdlib json module: briefs written by generate_meme_brief can contain NaN,
+    which orjson rejects.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            return json.loads(f.read()), None
+    except (OSError, ValueError) as e:
+        return None, e
+
+def iter_jsonl_lines(path):
+    """Yield the non-blank lines of a JSONL file as bytes, scanning it through mmap"""
+    if os.path.getsize(path) == 0:
+        return  # an empty file can't be mapped
+    
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < len(mm):
+            nl = mm.find(b'\n', pos)
+            if nl < 0:
+                nl = len(mm)
+            # Skip blank lines without building a stripped copy; the JSON parser ignores
+            # whitespace around the object itself
+            line = mm[pos:nl]
+            if line and not line.isspace():
+                yield line
+            pos = nl + 1
+
+@functools.lru_cache(maxsize=None)
+def load_templates(memedb_path):
+    """Parse memedb.jsonl once per run; the tests share the resulting template list"""
+    return [orjson.loads(line) for line in iter_jsonl_lines(memedb_path)]
 
 def test_meme_briefs():
     """Test loading meme briefs"""
     print("Testing meme briefs loading...")
     
-    briefs = []
     brief_dir = "meme_briefs"
     
-    if not os.path.exists(brief_dir):
+    # One directory read; DirEntry already knows each entry's name, path and type
+    try:
+        with os.scandir(brief_dir) as it:
+            entries = sorted(
+                (entry for entry in it
+                 if entry.name.startswith("brief_") and entry.name.endswith(".json") and entry.is_file()),
+                key=lambda entry: entry.name
+            )
+    except FileNotFoundError:
         print(f"❌ Directory {brief_dir} not found")
         return False
     
+    # Briefs are many small files, so read them concurrently; only the count and the
+    # first brief are reported, so each parsed brief is dropped once it's been checked
     count = 0
-    for filename in sorted(os.listdir(brief_dir)):
-        if filename.startswith("brief_") and filename.endswith(".json"):
-            filepath = os.path.join(brief_dir, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    brief = json.load(f)
-                    briefs.append(brief)
-                    count += 1
-            except Exception as e:
-                print(f"❌ Error loading {filename}: {e}")
-                return False
+    sample_brief = None
+    failures = []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        results = executor.map(load_brief, [entry.path for entry in entries])
+        for entry, (brief, error) in zip(entries, results):
+            if error is not None:
+                failures.append((entry.name, error))
+            else:
+                if sample_brief is None:
+                    sample_brief = brief
+                count += 1
+    
+    # Report every bad brief, not just the first
+    if failures:
+        for filename, error in failures:
+            print(f"❌ Error loading {filename}: {error}")
+        return False
     
     print(f"✅ Loaded {count} meme briefs")
-    if briefs:
-        print(f"   Sample brief: {briefs[0].get('search', 'Unknown')}")
+    if count:
+        print(f"   Sample brief: {sample_brief.get('search', 'Unknown')}")
     return True
 
 def test_meme_templates():
     """Test loading meme templates"""
     print("Testing meme templates loading...")
     
-    templates = []
     memedb_path = "memedb.jsonl"
     
-    if not os.path.exists(memedb_path):
+    try:
+        templates = load_templates(memedb_path)
+    except FileNotFoundError:
         print(f"❌ File {memedb_path} not found")
         return False
-    
-    try:
-        with open(memedb_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    template = json.loads(line.strip())
-                    templates.append(template)
     except Exception as e:
         print(f"❌ Error loading templates: {e}")
         return False
@@ -61,32 +113,34 @@ def test_meme_templates():
         print(f"   Sample template: {templates[0].get('name', 'Unknown')}")
     return True
 
-def test_template_images():
-    """Test that template images exist"""
+def test_template_images(fail_fast=False):
+    """Test that template images exist, stopping at the first missing one if fail_fast is set"""
     print("Testing template images...")
     
     memedb_path = "memedb.jsonl"
-    if not os.path.exists(memedb_path):
+    try:
+        templates = load_templates(memedb_path)
+    except FileNotFoundError:
         print(f"❌ File {memedb_path} not found")
         return False
-    
-    templates = []
-    try:
-        with open(memedb_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    template = json.loads(line.strip())
-                    templates.append(template)
     except Exception as e:
         print(f"❌ Error loading templates: {e}")
         return False
     
+    # List the template images once instead of checking each path separately
+    try:
+        with os.scandir("meme_templates") as it:
+            existing_images = {entry.name[:-4] for entry in it if entry.name.endswith(".jpg") and entry.is_file()}
+    except FileNotFoundError:
+        existing_images = set()
+    
     missing_images = []
     for template in templates:
         template_name = template.get('name', '')
-        image_path = f"meme_templates/{template_name}.jpg"
-        if not os.path.exists(image_path):
+        if template_name not in existing_images:
             missing_images.append(template_name)
+            if fail_fast:
+                break
     
     if missing_images:
         print(f"❌ Missing images for templates: {missing_images}")
@@ -100,10 +154,16 @@ def main():
     print("🧪 Testing Meme Generator data...")
     print("=" * 50)
     
+    # Check every input once up front, so nothing is parsed when data is missing
+    missing = [path for path in ("meme_briefs", "memedb.jsonl", "meme_templates") if not os.path.exists(path)]
+    if missing:
+        print(f"❌ Missing data: {', '.join(missing)}")
+        return
+    
     tests = [
         test_meme_briefs,
         test_meme_templates,
-        test_template_images
+        functools.partial(test_template_images, fail_fast="--fail-fast" in sys.argv[1:])
     ]
     
     passed = 0